@@ -7,22 +7,53 @@ window on macOS systems. For other platforms, it will return None.
 Dependencies (install with optional 'macos' extra):
 - mss
 - Pillow
+- numpy
+
+If OpenCV is installed (optional 'opencv' extra), it is used for faster downscaling.
 """
 
+from __future__ import annotations
+
+import logging
+import os
 import sys
-from typing import Optional
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# A single mss instance is kept alive and reused across captures, instead of
+# setting up CoreGraphics and its buffers again on every call
+_sct = None
+_sct_lock = threading.Lock()
+
+# Shared `NSWorkspace`, fetched on first capture
+_workspace = None
+
+# Resampling filter used to downscale screenshots, resolved on first capture
+_resize_filter = None
+
+
+def _get_resize_filter():
+    """
+    Resolve the resampling filter from UTTERTYPE_SCREENSHOT_FILTER.
+
+    Bicubic is vectorized in stock Pillow, Lanczos only in Pillow-SIMD (versioned
+    with a `.postN` suffix), so the default depends on which one is installed.
+    """
+    import PIL
+    from PIL import Image
+
+    default_filter = "LANCZOS" if "post" in PIL.__version__ else "BICUBIC"
+    return getattr(
+        Image,
+        os.getenv("UTTERTYPE_SCREENSHOT_FILTER", default_filter).upper(),
+        Image.BICUBIC,
+    )
 
-# Import conditionally to avoid errors on non-macOS systems
-if sys.platform == 'darwin':
-    try:
-        from PIL import Image
-    except ImportError:
-        print("Pillow not installed. Install with: uv sync --extra macos")
-else:
-    # Define Image class for type hints on non-macOS
-    class Image:
-        class Image:
-            pass
 
 def capture_active_window(max_dimension: int = 1200) -> Optional[Image.Image]:
     """
@@ -36,6 +67,8 @@ def capture_active_window(max_dimension: int = 1200) -> Optional[Image.Image]:
         PIL Image object if successful, None otherwise or on non-macOS platforms.
         The image will be scaled down to fit within max_dimension while preserving aspect ratio.
     """
+    global _sct, _workspace, _resize_filter
+
     # Check if we're on macOS
     if sys.platform != 'darwin':
         return None
@@ -43,26 +76,49 @@ def capture_active_window(max_dimension: int = 1200) -> Optional[Image.Image]:
     try:
         # Try to import the required libraries
         try:
+            import numpy as np
             from mss import mss
+            from PIL import Image
             # macOS-specific imports
             from AppKit import NSWorkspace
-            from Quartz import CGWindowListCopyWindowInfo, kCGWindowListOptionOnScreenOnly, kCGNullWindowID
+            from Quartz import (
+                CGWindowListCopyWindowInfo,
+                kCGNullWindowID,
+                kCGWindowListExcludeDesktopElements,
+                kCGWindowListOptionOnScreenOnly,
+            )
         except ImportError as e:
-            print(f"Required dependency not available: {e}")
-            print("Install macOS dependencies with: uv sync --extra macos")
+            logger.error(
+                "Required dependency not available: %s. "
+                "Install macOS dependencies with: uv sync --extra macos", e
+            )
             return None
+
+        try:
+            import cv2
+        except ImportError:
+            cv2 = None
         
         # Get active application
-        active_app = NSWorkspace.sharedWorkspace().activeApplication()
+        if _workspace is None:
+            _workspace = NSWorkspace.sharedWorkspace()
+        active_app = _workspace.activeApplication()
         app_pid = active_app['NSApplicationProcessIdentifier']
         
-        # Get information about the frontmost window
-        window_list = CGWindowListCopyWindowInfo(kCGWindowListOptionOnScreenOnly, kCGNullWindowID)
+        # Get information about the on-screen windows, skipping desktop elements
+        window_list = CGWindowListCopyWindowInfo(
+            kCGWindowListOptionOnScreenOnly | kCGWindowListExcludeDesktopElements,
+            kCGNullWindowID,
+        )
 
-        # Find the frontmost window that belongs to our active application
+        # Find the frontmost normal-layer window that belongs to our active
+        # application (windows are listed front to back)
         target_window = None
         for window in window_list:
-            if window.get('kCGWindowOwnerPID', 0) == app_pid:
+            if (
+                window.get('kCGWindowOwnerPID', 0) == app_pid
+                and window.get('kCGWindowLayer', 0) == 0
+            ):
                 # This window belongs to our active application
                 target_window = window
                 break
@@ -81,25 +137,58 @@ def capture_active_window(max_dimension: int = 1200) -> Optional[Image.Image]:
             # Could not find specific window, return None
             return None
             
-        # Take the screenshot using mss
-        with mss() as sct:
-            screenshot = sct.grab(monitor)
-            # Convert to PIL Image
-            img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-            
-            # Resize the image if it's larger than max_dimension
-            width, height = img.size
-            if width > max_dimension or height > max_dimension:
-                # Calculate the scaling factor to preserve aspect ratio
-                scale_factor = min(max_dimension / width, max_dimension / height)
-                new_width = int(width * scale_factor)
-                new_height = int(height * scale_factor)
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-                
-            return img
-            
+        # Take the screenshot using the shared mss instance
+        with _sct_lock:
+            if _sct is None:
+                _sct = mss()
+            screenshot = _sct.grab(monitor)
+
+        # View the native BGRA buffer directly and reorder it to RGB, so the
+        # only full-image copy is the one made inside `Image.fromarray`
+        arr = np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(
+            screenshot.height, screenshot.width, 4
+        )
+
+        # OpenCV's area interpolation is vectorized for 8-bit images and works well
+        # for downscaling, unless a Pillow filter was explicitly requested. It
+        # resizes the native buffer directly, so no full-size image is ever built.
+        if cv2 is not None and "UTTERTYPE_SCREENSHOT_FILTER" not in os.environ:
+            scale_factor = min(
+                1.0,
+                max_dimension / screenshot.width,
+                max_dimension / screenshot.height,
+            )
+            if scale_factor < 1.0:
+                arr = cv2.resize(
+                    arr,
+                    (int(screenshot.width * scale_factor), int(screenshot.height * scale_factor)),
+                    interpolation=cv2.INTER_AREA,
+                )
+            return Image.fromarray(cv2.cvtColor(arr, cv2.COLOR_BGRA2RGB))
+
+        # Pre-shrink by an integer factor with a strided view, so the resampling
+        # pass below only runs on an image already close to the target size
+        subsample = max(1, max(screenshot.width, screenshot.height) // max_dimension)
+        if subsample > 1:
+            arr = arr[::subsample, ::subsample]
+
+        img = Image.fromarray(arr[..., 2::-1])
+
+        # Resize the image if it's larger than max_dimension
+        width, height = img.size
+        if width > max_dimension or height > max_dimension:
+            # Calculate the scaling factor to preserve aspect ratio
+            scale_factor = min(max_dimension / width, max_dimension / height)
+            new_width = int(width * scale_factor)
+            new_height = int(height * scale_factor)
+            if _resize_filter is None:
+                _resize_filter = _get_resize_filter()
+            img = img.resize((new_width, new_height), _resize_filter)
+
+        return img
+
     except Exception as e:
-        print(f"Error capturing screenshot: {e}")
+        logger.exception("Error capturing screenshot: %s", e)
         return None
 
 
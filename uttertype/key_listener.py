@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 from pynput.keyboard import HotKey
 
@@ -62,6 +63,11 @@ class UnifiedHotKey(HotKey):
             self._on_deactivate()
 
 
+# pynput cannot parse the globe key by name, so it is replaced by its virtual key code
+GLOBE_KEY_RE = re.compile(r"<globe>", re.IGNORECASE)
+GLOBE_KEY_CODE = f"<{UnifiedHotKey.GLOBE_KEY_VK}>"
+
+
 def create_keylistener(transcriber):
     key_code = os.getenv(
         "UTTERTYPE_RECORD_HOTKEYS",
@@ -69,8 +75,7 @@ def create_keylistener(transcriber):
     )
 
     # Convert the globe key to its virtual key code
-    if '<globe>' in key_code:
-        key_code = key_code.replace('<globe>', '<63>')
+    key_code = GLOBE_KEY_RE.sub(GLOBE_KEY_CODE, key_code)
 
     return UnifiedHotKey(
         UnifiedHotKey.parse(key_code),
@@ -2,13 +2,38 @@ from dotenv import load_dotenv
 load_dotenv()  # Load environment variables up front
 
 import asyncio
+import logging
+import logging.handlers
 import os
+import queue
 from pynput import keyboard
 from uttertype.transcribers import WhisperAPITranscriber, GeminiTranscriber, WhisperLocalMLXTranscriber
 from uttertype.table_interface import ConsoleTable
 from uttertype.key_listener import create_keylistener
 from uttertype.utils import manual_type
 
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Send log records through a queue to a stderr handler on a background thread,
+    so logging never blocks recording or transcription on terminal I/O.
+
+    Returns:
+        The started listener, to be stopped on shutdown.
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+
+    root_logger = logging.getLogger()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(os.getenv('UTTERTYPE_LOG_LEVEL', 'WARNING').upper())
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+
 async def main():
     # Choose transcriber based on environment variable
     transcriber_provider = os.getenv('UTTERTYPE_PROVIDER', 'openai').lower()
@@ -22,6 +47,7 @@ async def main():
     else:
         raise ValueError(f'Invalid transcriber provider: {transcriber_provider}')
 
+    transcriber.bind_loop(asyncio.get_running_loop())
     hotkey = create_keylistener(transcriber)
 
     keyboard_listener = keyboard.Listener(on_press=hotkey.press, on_release=hotkey.release)
@@ -47,7 +73,11 @@ async def main():
 
 def run_app():
     """Entry point for the uttertype application when installed via pip/uv"""
-    asyncio.run(main())
+    log_listener = configure_logging()
+    try:
+        asyncio.run(main())
+    finally:
+        log_listener.stop()
 
 
 if __name__ == "__main__":
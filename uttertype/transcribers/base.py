@@ -4,26 +4,83 @@ Base transcriber implementation.
 
 import os
 import io
-from typing import List, Tuple
+import logging
+import struct
+import audioop  # Deprecated since 3.11, available on all supported Pythons (<3.13)
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Union
+import httpx
 import pyaudio
-import wave
 import asyncio
 from threading import Thread, Event
 import webrtcvad
 from uttertype.utils import transcription_concat
 
+logger = logging.getLogger(__name__)
+
 # Audio configuration constants
 FORMAT = pyaudio.paInt16  # Audio format
 CHANNELS = 1  # Mono audio
 RATE = 16000  # Sample rate
 CHUNK_DURATION_MS = 30  # Frame duration in milliseconds
 CHUNK = int(RATE * CHUNK_DURATION_MS / 1000)
+SAMPLE_WIDTH = pyaudio.get_sample_size(FORMAT)  # Bytes per sample
+BYTES_PER_MS = RATE * CHANNELS * SAMPLE_WIDTH // 1000
+CHUNK_BYTES = CHUNK * CHANNELS * SAMPLE_WIDTH
+# Number of frames read from the microphone at once, fewer reads per second of
+# audio keep the per-read bookkeeping off the real-time path
+CHUNKS_PER_READ = 3
 # Minimum duration of speech to send to API as a chunk between gaps of silence
 MIN_TRANSCRIPTION_CHUNK_SIZE_MS = 10000
 # Minimum duration of recording to process (in milliseconds)
 # Recordings shorter than this will be ignored (useful for preventing
 # accidental transcriptions from quick hotkey presses)
 MIN_RECORDING_DURATION_MS = int(os.getenv('UTTERTYPE_MIN_RECORDING_MS', 300))
+# Expected maximum recording length, the audio buffer is pre-sized for it so it
+# does not need to grow while recording (longer recordings still work)
+MAX_RECORDING_DURATION_S = int(os.getenv('UTTERTYPE_MAX_RECORDING_SECONDS', 120))
+# Frames quieter than this fraction of the noise floor are treated as silence, and
+# frames louder than this multiple as speech, without running the VAD on them
+NOISE_FLOOR_SILENCE_RATIO = 0.8
+NOISE_FLOOR_SPEECH_RATIO = 3.0
+NOISE_FLOOR_SMOOTHING = 0.02  # Weight of each new silent frame in the noise floor
+# Lowest noise floor, so digital silence at the start of a stream does not make
+# all later room noise look like speech
+NOISE_FLOOR_MIN_RMS = 50
+# Every this many frames classed as speech from their energy alone, one goes
+# through the VAD anyway, so the noise floor can rise with the background noise
+NOISE_FLOOR_RECHECK_FRAMES = 10
+# Maximum number of rolling transcription chunks transcribed concurrently
+ROLLING_TRANSCRIPTION_WORKERS = int(os.getenv('UTTERTYPE_ROLLING_WORKERS', 2))
+# Maximum number of finished transcriptions waiting to be typed
+TRANSCRIPTION_QUEUE_SIZE = 16
+# Connection pool settings shared by the API clients. Connections are kept alive
+# between dictations, so requests do not pay for a new TLS handshake each time.
+HTTP_POOL_LIMITS = httpx.Limits(max_keepalive_connections=8, keepalive_expiry=300)
+
+# Canonical 44-byte PCM WAV header: RIFF chunk, fmt sub-chunk, data sub-chunk header
+WAV_HEADER_FORMAT = "<4sI4s4sIHHIIHH4sI"
+WAV_HEADER_SIZE = struct.calcsize(WAV_HEADER_FORMAT)
+
+
+def _wav_header(data_size: int) -> bytes:
+    """Build the WAV header for `data_size` bytes of PCM audio in the recording format."""
+    return struct.pack(
+        WAV_HEADER_FORMAT,
+        b"RIFF",
+        36 + data_size,  # Size of everything after this field
+        b"WAVE",
+        b"fmt ",
+        16,  # Size of the fmt sub-chunk
+        1,  # PCM
+        CHANNELS,
+        RATE,
+        RATE * CHANNELS * SAMPLE_WIDTH,  # Byte rate
+        CHANNELS * SAMPLE_WIDTH,  # Block align
+        SAMPLE_WIDTH * 8,  # Bits per sample
+        b"data",
+        data_size,
+    )
 
 
 class AudioTranscriber:
@@ -32,62 +89,88 @@ class AudioTranscriber:
     
     This class handles the recording and preprocessing of audio data.
     Subclasses must implement the transcribe_audio method.
+
+    Subclasses that set `accepts_raw_pcm` receive the recorded audio as raw
+    16-bit PCM bytes instead of a WAV file.
     """
+
+    accepts_raw_pcm = False
     
     def __init__(self):
         self.audio = pyaudio.PyAudio()
         self.recording_finished = Event()  # Threading event to end recording
         self.recording_finished.set()  # Initialize as finished
-        self.frames = []
+        # Recorded PCM audio since the last rolling cut, in the first `frames_len`
+        # bytes of a pre-sized buffer
+        self.frames = bytearray()
+        self.frames_len = 0
         self.audio_duration = 0
-        self.rolling_transcriptions: List[Tuple[int, str]] = []  # (idx, transcription)
-        self.rolling_requests: List[Thread] = []  # list of pending requests
-        self.event_loop = asyncio.get_event_loop()
+        self._record_thread: Optional[Thread] = None
+        self.rolling_requests: List[Future] = []  # list of pending requests
+        self._rolling_pool = ThreadPoolExecutor(max_workers=ROLLING_TRANSCRIPTION_WORKERS)
+        # Final chunks are transcribed off the hotkey listener thread, one recording
+        # at a time so transcriptions are typed in the order they were recorded
+        self._finish_pool = ThreadPoolExecutor(max_workers=1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # Set by `bind_loop`
         self.vad = webrtcvad.Vad(1)  # Voice Activity Detector, mode can be 0 to 3
-        self.transcriptions = asyncio.Queue()
+        self._noise_floor: Optional[float] = None  # RMS energy of silent frames
+        self._loud_frames_unchecked = 0  # Frames classed as speech without the VAD
+        self.transcriptions = asyncio.Queue(maxsize=TRANSCRIPTION_QUEUE_SIZE)
         self.recording_canceled = False  # Flag to track if recording should be canceled
         self.stream = None  # Initialize stream as None until needed
 
+    def bind_loop(self, loop: asyncio.AbstractEventLoop):
+        """Bind the event loop that consumes `get_transcriptions`."""
+        self._loop = loop
+
     def start_recording(self):
         """Start recording audio from the microphone."""
         # Reset the canceled flag when starting a new recording
         self.recording_canceled = False
+
+        # Reserve the audio buffer once, instead of growing it chunk by chunk
+        self.frames = bytearray(MAX_RECORDING_DURATION_S * 1000 * BYTES_PER_MS)
+        self.frames_len = 0
+
+        # Created before the thread starts, so an early stop cannot be missed
+        self.recording_finished = Event()
         
         # Start a new recording in the background, do not block
         def _record():
-            self.recording_finished = Event()
             # Create audio stream only when recording starts
             self.stream = self.audio.open(
                 format=FORMAT,
                 channels=CHANNELS,
                 rate=RATE,
                 input=True,
-                frames_per_buffer=CHUNK,
+                frames_per_buffer=CHUNK * CHUNKS_PER_READ,
             )
-            intermediate_trancriptions_idx = 0
+            self._noise_floor = None  # Re-learn the noise floor for every recording
+            self._loud_frames_unchecked = 0
             while (
                 not self.recording_finished.is_set()
             ):  # Keep recording until interrupted
-                data = self.stream.read(CHUNK)
-                self.audio_duration += CHUNK_DURATION_MS
-                is_speech = self.vad.is_speech(data, RATE)
-                current_audio_duration = len(self.frames) * CHUNK_DURATION_MS
+                data = self.stream.read(CHUNK * CHUNKS_PER_READ)
+                self.audio_duration += CHUNK_DURATION_MS * CHUNKS_PER_READ
+                # The VAD works on single frames, any silent frame counts as silence.
+                # Every frame is classified, so each one feeds the noise floor.
+                is_speech = all([
+                    self._is_speech(data[offset:offset + CHUNK_BYTES])
+                    for offset in range(0, len(data), CHUNK_BYTES)
+                ])
+                current_audio_duration = self.frames_len // BYTES_PER_MS
                 if (
                     not is_speech
                     and current_audio_duration >= MIN_TRANSCRIPTION_CHUNK_SIZE_MS
                 ):  # silence
-                    rolling_request = Thread(
-                        target=self._intermediate_transcription,
-                        args=(
-                            intermediate_trancriptions_idx,
-                            self._frames_to_wav(),
-                        ),
+                    rolling_request = self._rolling_pool.submit(
+                        self.transcribe_audio,
+                        self._frames_to_audio(),
                     )
-                    self.frames = []
+                    self.frames_len = 0  # Reuse the buffer for the next chunk
                     self.rolling_requests.append(rolling_request)
-                    rolling_request.start()
-                    intermediate_trancriptions_idx += 1
-                self.frames.append(data)
+                self.frames[self.frames_len:self.frames_len + len(data)] = data
+                self.frames_len += len(data)
             
             # Close audio stream after recording is finished
             if self.stream:
@@ -96,77 +179,133 @@ class AudioTranscriber:
                 self.stream = None
 
         # start recording in a new non-blocking thread
-        Thread(target=_record).start()
+        self._record_thread = Thread(target=_record)
+        self._record_thread.start()
 
     def stop_recording(self):
-        """Stop the recording and reset variables"""
+        """Stop the recording, hand it off to be transcribed and reset variables"""
         self.recording_finished.set()
+        # Wait for the last read of the microphone, at most one read long
+        if self._record_thread is not None:
+            self._record_thread.join()
+            self._record_thread = None
         
         # Skip processing if recording is too short or was canceled
         if self.audio_duration < MIN_RECORDING_DURATION_MS or self.recording_canceled:
             # Reset variables without processing
-            self.frames = []
+            self.frames_len = 0
             self.audio_duration = 0
             self.rolling_requests = []
-            self.rolling_transcriptions = []
             # Reset canceled flag
             self.recording_canceled = False
             return
-            
-        self._finish_transcription()
-        self.frames = []
+
+        if self._loop is None:
+            raise RuntimeError("No event loop bound, call bind_loop() first")
+
+        # The final chunk is transcribed in the background, so the hotkey listener
+        # is never blocked on transcription requests and their retries
+        self._finish_pool.submit(
+            self._finish_transcription,
+            self._frames_to_audio(),
+            self.rolling_requests,
+            self.audio_duration,
+        )
+        self.frames_len = 0
         self.audio_duration = 0
         self.rolling_requests = []
-        self.rolling_transcriptions = []
         # Reset canceled flag
         self.recording_canceled = False
 
-    def _intermediate_transcription(self, idx, audio):
-        intermediate_transcription = self.transcribe_audio(audio)
-        self.rolling_transcriptions.append((idx, intermediate_transcription))
+    def _is_speech(self, frame: bytes) -> bool:
+        """
+        Classify an audio frame as speech or silence.
+
+        Frames clearly below or above the running noise floor are classified from
+        their RMS energy alone, only ambiguous frames go through the VAD. Loud
+        frames are still sent to the VAD now and then, so a floor that became too
+        low (e.g. a fan switching on) is corrected.
+        """
+        rms = audioop.rms(frame, SAMPLE_WIDTH)
+        noise_floor = self._noise_floor
+        is_loud = noise_floor is not None and rms > NOISE_FLOOR_SPEECH_RATIO * noise_floor
 
-    def _finish_transcription(self):
-        for request in self.rolling_requests:  # Wait for all of the rolling requests
-            request.join()
+        if noise_floor is not None and rms < NOISE_FLOOR_SILENCE_RATIO * noise_floor:
+            is_speech = False
+        elif is_loud and self._loud_frames_unchecked < NOISE_FLOOR_RECHECK_FRAMES:
+            self._loud_frames_unchecked += 1
+            is_speech = True
+        else:
+            self._loud_frames_unchecked = 0
+            is_speech = self.vad.is_speech(frame, RATE)
 
-        # Process the final transcription chunk
-        final_transcription_chunk = self.transcribe_audio(
-            self._frames_to_wav()
-        )
+        # Track the energy of silent frames only, so speech does not raise the floor
+        if not is_speech:
+            if noise_floor is None or is_loud:
+                # First frame, or background noise far above the floor: start over
+                # from this frame instead of slowly averaging towards it
+                self._noise_floor = max(rms, NOISE_FLOOR_MIN_RMS)
+            else:
+                self._noise_floor = max(
+                    (1 - NOISE_FLOOR_SMOOTHING) * noise_floor + NOISE_FLOOR_SMOOTHING * rms,
+                    NOISE_FLOOR_MIN_RMS,
+                )
 
-        # Sort by idx
-        sorted_transcription_chunks = sorted(self.rolling_transcriptions, key=lambda x: x[0])
+        return is_speech
 
-        # Get only the transcription texts
-        transcriptions = [t[1] for t in sorted_transcription_chunks] + [final_transcription_chunk]
+    def _finish_transcription(
+        self,
+        audio: Union[io.BytesIO, bytes],
+        rolling_requests: List[Future],
+        audio_duration: int,
+    ):
+        # Process the final transcription chunk while the rolling requests finish
+        final_transcription_chunk = self.transcribe_audio(audio)
+
+        # Rolling requests were submitted in order
+        transcriptions = []
+        for rolling_request in rolling_requests:
+            try:
+                transcriptions.append(rolling_request.result())
+            except Exception as e:
+                logger.exception("Rolling transcription failed: %s", e)
+        transcriptions.append(final_transcription_chunk)
 
         # Put final combined result in finished queue
-        self.event_loop.call_soon_threadsafe(
-            self.transcriptions.put_nowait,
-            (transcription_concat(transcriptions), self.audio_duration),
+        asyncio.run_coroutine_threadsafe(
+            self.transcriptions.put(
+                (transcription_concat(transcriptions), audio_duration)
+            ),
+            self._loop,
         )
 
+    def _frames_to_audio(self) -> Union[io.BytesIO, bytes]:
+        """Package the recorded frames in the format `transcribe_audio` accepts."""
+        if self.accepts_raw_pcm:
+            return self._frames_to_pcm()
+        return self._frames_to_wav()
+
+    def _frames_to_pcm(self) -> bytes:
+        return bytes(memoryview(self.frames)[:self.frames_len])
+
     def _frames_to_wav(self):
-        buffer = io.BytesIO()
+        buffer = io.BytesIO(
+            _wav_header(self.frames_len) + memoryview(self.frames)[:self.frames_len]
+        )
         buffer.name = "tmp.wav"
-        wf = wave.open(buffer, "wb")
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(self.audio.get_sample_size(FORMAT))
-        wf.setframerate(RATE)
-        wf.writeframes(b"".join(self.frames))
-        wf.close()
         return buffer
         
     def cancel_recording(self):
         """Mark the current recording as canceled so it will not be processed"""
         self.recording_canceled = True
 
-    def transcribe_audio(self, audio: io.BytesIO) -> str:
+    def transcribe_audio(self, audio: Union[io.BytesIO, bytes]) -> str:
         """
         Transcribe audio data to text.
         
         Args:
-            audio: Audio data in BytesIO object.
+            audio: WAV audio data in BytesIO object, or raw 16-bit PCM bytes
+                if `accepts_raw_pcm` is set.
             
         Returns:
             Transcription as text.
@@ -191,6 +330,10 @@ class AudioTranscriber:
             self.stream.close()
             self.stream = None
             
+        # Stop the transcription workers
+        self._rolling_pool.shutdown(wait=False, cancel_futures=True)
+        self._finish_pool.shutdown(wait=False, cancel_futures=True)
+
         # Terminate PyAudio instance
         if hasattr(self, 'audio') and self.audio:
             self.audio.terminate()
\ No newline at end of file
@@ -4,18 +4,103 @@ Google Gemini API transcriber implementation.
 
 import os
 import io
-from typing import Optional
-from textwrap import dedent
+import logging
+import math
+import random
+import time
+import audioop  # Deprecated since 3.11, available on all supported Pythons (<3.13)
+from threading import Thread
+from typing import Dict, Optional, Tuple
+import httpx
 from pydantic import BaseModel
 from google import genai
-from google.genai import types
-from uttertype.transcribers.base import AudioTranscriber
+from google.genai import errors, types
+from uttertype.transcribers.base import (
+    AudioTranscriber,
+    BYTES_PER_MS,
+    HTTP_POOL_LIMITS,
+    SAMPLE_WIDTH,
+    WAV_HEADER_SIZE,
+)
+from uttertype.utils import env_flag
+
+logger = logging.getLogger(__name__)
+
+# Transient failures (rate limits, server errors, network timeouts) are retried
+# with exponential backoff, starting at RETRY_INITIAL_DELAY_S plus up to
+# RETRY_JITTER_S of random jitter, so a dictation is not lost to a hiccup
+RETRY_ATTEMPTS = 3
+RETRY_INITIAL_DELAY_S = 1.0
+RETRY_MAX_DELAY_S = 15.0
+RETRY_JITTER_S = 1.0
+
+# Audio larger than this is uploaded through the Files API instead of being sent
+# base64-encoded inside the request. Smaller clips stay inline, since the extra
+# upload round-trips would outweigh the encoding overhead (~30 s of audio).
+MAX_INLINE_AUDIO_BYTES = 1_000_000
+# Requests larger than this are rejected by the API, base64-encoded inline data included
+MAX_REQUEST_BYTES = 20_000_000
+FILE_PROCESSING_POLL_INTERVAL_S = 0.1
+# Uploads still processing after this long are given up on
+FILE_PROCESSING_TIMEOUT_S = 5.0
+# Audio smaller than this is sent as WAV as is, compressing it saves too little
+MIN_COMPRESSED_AUDIO_BYTES = 64_000
+# Short clips quieter than this RMS energy are treated as silence and not sent
+SILENCE_RMS_THRESHOLD = 300
+SILENCE_MAX_DURATION_MS = 800
+
+TRANSCRIPTION_PROMPT = """\
+Audio Transcription Guidelines
+
+Your task is to transcribe the provided audio accurately. Whether the audio contains normal speech or technical content with varied speeds, please adhere to the following guidelines:
+
+1. Transcribe exactly what is spoken, preserving the original meaning and content.
+
+2. Assume English is spoken, unless it is clear another language is spoken.
+
+3. Numbers should be numerical and not written as words.
+
+4. For special characters that are spoken by name (such as "underscore," "dash," "period"), convert them to their corresponding symbols (_, -, .) when contextually appropriate, such as in:
+  - Email addresses
+  - Website URLs
+  - File names
+  - Programming code
+  - Mathematical expressions
+
+5. Maintain proper punctuation, capitalization, and paragraph breaks to enhance readability.
+
+6. For technical content, preserve technical terms, acronyms, and specialized vocabulary exactly as spoken.
+
+7. Remove any ums and uhs. Connect their thought so that it is fluid.
+
+8. The user may have self-edited while speaking. If the user corrects themselves (usually via some interjection like "I meant" or "no, no"), edit the transcription to reflect their intended meaning rather than including the correction process itself.
+
+<EXAMPLE>
+User Said: "The art of doing science and engineering. I mean just science."
+Expected Transcription: "The art of doing science."
+</EXAMPLE>
+
+Note:
+Before transcribing the input audio, you have to make a determination if the audio contains any dictation audio. You may hear silence or music. In this case, set the `is_there_dictation` to False. If you hear a dictation, set this to `True` and transcribe the dictation.
+
+Below will follow the audio.
+"""
+
+
+class TranscriptionOut(BaseModel):
+    """Structured response expected from Gemini."""
+    is_there_dictation: bool
+    transcription: str
 
 
 class GeminiTranscriber(AudioTranscriber):
     """
     Transcriber implementation using Google's Gemini API.
     """
+
+    # Clients are shared between instances with the same connection settings,
+    # to reuse connections
+    _clients: Dict[tuple, genai.Client] = {}
     
     def __init__(self, 
                  api_key: Optional[str] = None, 
@@ -35,11 +120,12 @@ class GeminiTranscriber(AudioTranscriber):
             model: Gemini model name
         """
         super().__init__(*args, **kwargs)
+        self.use_vertex = use_vertex
         
         if use_vertex:
             if not project:
                 raise ValueError("Project ID is required for Vertex AI")
-            self.client = genai.Client(
+            self.client = self._get_client(
                 vertexai=True,
                 project=project,
                 location=location
@@ -47,45 +133,31 @@ class GeminiTranscriber(AudioTranscriber):
         else:
             if not api_key:
                 raise ValueError("API key is required for Gemini API")
-            self.client = genai.Client(api_key=api_key)
+            self.client = self._get_client(api_key=api_key)
         
         self.model_name = model
-        self.prompt = dedent("""\
-        Audio Transcription Guidelines
-
-        Your task is to transcribe the provided audio accurately. Whether the audio contains normal speech or technical content with varied speeds, please adhere to the following guidelines:
-
-        1. Transcribe exactly what is spoken, preserving the original meaning and content.
-
-        2. Assume English is spoken, unless it is clear another language is spoken.
-
-        3. Numbers should be numerical and not written as words.
-
-        4. For special characters that are spoken by name (such as "underscore," "dash," "period"), convert them to their corresponding symbols (_, -, .) when contextually appropriate, such as in:
-          - Email addresses
-          - Website URLs
-          - File names
-          - Programming code
-          - Mathematical expressions
-
-        5. Maintain proper punctuation, capitalization, and paragraph breaks to enhance readability.
-
-        6. For technical content, preserve technical terms, acronyms, and specialized vocabulary exactly as spoken.
+        self.prompt = TRANSCRIPTION_PROMPT
+        # Bound once, so requests skip the attribute lookups and prompt packing
+        self._generate = self.client.models.generate_content
+        self._base_contents = (self.prompt,)
+        self._generation_config = {
+            'response_mime_type': 'application/json',
+            'response_schema': TranscriptionOut,
+        }
 
-        7. Remove any ums and uhs. Connect their thought so that it is fluid.
-
-        8. The user may have self-edited while speaking. If the user corrects themselves (usually via some interjection like "I meant" or "no, no"), edit the transcription to reflect their intended meaning rather than including the correction process itself.
-
-        <EXAMPLE>
-        User Said: "The art of doing science and engineering. I mean just science."
-        Expected Transcription: "The art of doing science."
-        </EXAMPLE>
-
-        Note:
-        Before transcribing the input audio, you have to make a determination if the audio contains any dictation audio. You may hear silence or music. In this case, set the `is_there_dictation` to False. If you hear a dictation, set this to `True` and transcribe the dictation.
-
-        Below will follow the audio.
-        """)
+    @classmethod
+    def _get_client(cls, **client_kwargs) -> genai.Client:
+        """Get the shared client for these settings, creating it on first use."""
+        key = tuple(sorted(client_kwargs.items()))
+        if key not in cls._clients:
+            cls._clients[key] = genai.Client(
+                http_options=types.HttpOptions(
+                    client_args={'limits': HTTP_POOL_LIMITS},
+                    async_client_args={'limits': HTTP_POOL_LIMITS},
+                ),
+                **client_kwargs,
+            )
+        return cls._clients[key]
 
     @staticmethod
     def create(*args, **kwargs):
@@ -95,7 +167,7 @@ class GeminiTranscriber(AudioTranscriber):
         Returns:
             GeminiTranscriber instance
         """
-        use_vertex = os.getenv('GEMINI_USE_VERTEX', 'false').lower() in ('true', 'yes', '1', 't')
+        use_vertex = env_flag('GEMINI_USE_VERTEX')
         project = os.getenv('GEMINI_PROJECT_ID')
         api_key = os.getenv('GEMINI_API_KEY')
         model = os.getenv('GEMINI_MODEL_NAME', 'gemini-2.0-flash')
@@ -108,7 +180,151 @@ class GeminiTranscriber(AudioTranscriber):
             location=location,
             model=model
         )
-    
+
+    def _generate_content_with_retries(
+        self, contents: list
+    ) -> types.GenerateContentResponse:
+        """
+        Send a request to Gemini, prefixed by the prompt, retrying transient
+        failures with backoff.
+        """
+        contents = [*self._base_contents, *contents]
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                return self._generate(
+                    model=self.model_name,
+                    contents=contents,
+                    config=self._generation_config,
+                )
+            except Exception as e:
+                if attempt == RETRY_ATTEMPTS - 1 or not self._is_retryable(e):
+                    raise
+                delay = min(RETRY_MAX_DELAY_S, RETRY_INITIAL_DELAY_S * 2 ** attempt)
+                delay += random.uniform(0, RETRY_JITTER_S)
+                logger.warning(
+                    "Gemini request failed (attempt %d of %d), retrying in %.1fs: %s",
+                    attempt + 1, RETRY_ATTEMPTS, delay, e,
+                )
+                time.sleep(delay)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Whether a failed request may succeed if sent again."""
+        if isinstance(error, errors.ServerError):
+            return True
+        if isinstance(error, errors.ClientError):
+            return error.code == 429  # Rate limited, auth and request errors are final
+        return isinstance(error, httpx.TransportError)  # Timeouts, dropped connections
+
+    def _compress_audio(self, audio_bytes: memoryview) -> Tuple[memoryview, str]:
+        """
+        Re-encode WAV audio as FLAC to shrink the upload, if soundfile is installed.
+
+        Returns:
+            The audio bytes to send and their MIME type. The WAV audio is returned
+            unchanged if it is small, or if encoding is unavailable or fails.
+        """
+        if len(audio_bytes) < MIN_COMPRESSED_AUDIO_BYTES:
+            return audio_bytes, 'audio/wav'
+
+        try:
+            import soundfile as sf
+        except ImportError:
+            return audio_bytes, 'audio/wav'
+
+        try:
+            samples, sample_rate = sf.read(io.BytesIO(audio_bytes), dtype='int16')
+            buffer = io.BytesIO()
+            sf.write(buffer, samples, sample_rate, format='FLAC', subtype='PCM_16')
+        except RuntimeError as e:  # soundfile raises RuntimeError subclasses
+            logger.warning("FLAC encoding failed, sending WAV instead: %s", e)
+            return audio_bytes, 'audio/wav'
+
+        flac_bytes = buffer.getbuffer()
+        if len(flac_bytes) >= len(audio_bytes):
+            return audio_bytes, 'audio/wav'
+        return flac_bytes, 'audio/flac'
+
+    def _upload_audio(self, audio_bytes: memoryview, mime_type: str) -> types.File:
+        """
+        Upload audio through the Files API and wait until it can be used.
+
+        Raises:
+            TimeoutError: If the upload is still processing after
+                FILE_PROCESSING_TIMEOUT_S.
+        """
+        audio_file = self.client.files.upload(
+            file=io.BytesIO(audio_bytes),
+            config=types.UploadFileConfig(mime_type=mime_type),
+        )
+        deadline = time.monotonic() + FILE_PROCESSING_TIMEOUT_S
+        while audio_file.state == types.FileState.PROCESSING:
+            if time.monotonic() >= deadline:
+                Thread(target=self._delete_file, args=(audio_file.name,)).start()
+                raise TimeoutError(
+                    f"Uploaded audio {audio_file.name} still processing after "
+                    f"{FILE_PROCESSING_TIMEOUT_S}s"
+                )
+            time.sleep(FILE_PROCESSING_POLL_INTERVAL_S)
+            audio_file = self.client.files.get(name=audio_file.name)
+
+        if audio_file.state == types.FileState.FAILED:
+            raise RuntimeError(f"Processing of uploaded audio {audio_file.name} failed")
+        return audio_file
+
+    def _delete_file(self, name: str):
+        """Delete an uploaded file, so uploads do not count against file quotas."""
+        try:
+            self.client.files.delete(name=name)
+        except errors.APIError as e:
+            logger.warning("Could not delete uploaded audio %s: %s", name, e)
+
+    def _audio_part(
+        self, audio: io.BytesIO
+    ) -> Tuple[Optional[types.Part], Optional[types.File]]:
+        """
+        Prepare a recording to be sent to Gemini.
+
+        Returns:
+            The audio part, or None if the recording is silent, and the uploaded
+            file backing the part if any, to be deleted once the request is done.
+        """
+        # View the audio bytes of the BytesIO object without copying them
+        audio_bytes = audio.getbuffer()
+
+        # Accidental hotkey presses and coughs need no round-trip to Gemini
+        pcm = audio_bytes[WAV_HEADER_SIZE:]
+        if (
+            len(pcm) // BYTES_PER_MS < SILENCE_MAX_DURATION_MS
+            and audioop.rms(pcm, SAMPLE_WIDTH) < SILENCE_RMS_THRESHOLD
+        ):
+            return None, None
+
+        audio_bytes, mime_type = self._compress_audio(audio_bytes)
+
+        # The Files API is only available on the Gemini Developer API
+        if len(audio_bytes) > MAX_INLINE_AUDIO_BYTES and not self.use_vertex:
+            try:
+                uploaded_file = self._upload_audio(audio_bytes, mime_type)
+            except TimeoutError as e:
+                # Inline data is base64 encoded, which takes 4 bytes for every 3
+                if 4 * math.ceil(len(audio_bytes) / 3) > MAX_REQUEST_BYTES:
+                    raise
+                logger.warning("%s, sending the audio inline instead", e)
+            else:
+                audio_part = types.Part.from_uri(
+                    file_uri=uploaded_file.uri,
+                    mime_type=mime_type,
+                )
+                return audio_part, uploaded_file
+
+        # The SDK validates inline data as bytes, so copy only here
+        audio_part = types.Part.from_bytes(
+            data=bytes(audio_bytes),
+            mime_type=mime_type,
+        )
+        return audio_part, None
+
     def transcribe_audio(self, audio: io.BytesIO) -> str:
         """
         Transcribe audio using Google Gemini API.
@@ -119,38 +335,27 @@ class GeminiTranscriber(AudioTranscriber):
         Returns:
             Transcription as text
         """
+        uploaded_file = None
         try:
-            # Get the audio bytes directly from the BytesIO object
-            audio_bytes = audio.getvalue()
-
-            class TranscriptionOut(BaseModel):
-              is_there_dictation: bool
-              transcription: str
+            audio_part, uploaded_file = self._audio_part(audio)
+            if audio_part is None:
+                return ""
 
             # Send to Gemini API
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[
-                    self.prompt,
-                    types.Part.from_bytes(
-                        data=audio_bytes,
-                        mime_type='audio/wav',
-                    ),
-                ],
-                config={
-                    'response_mime_type': 'application/json',
-                    'response_schema': TranscriptionOut,
-                },
-            )
+            parsed = self._generate_content_with_retries([audio_part]).parsed
 
             # No dictation was detected, so return empty string
-            if not response.parsed.is_there_dictation:
+            if not parsed.is_there_dictation:
                 return ""
 
             # Extract transcription from response
-            transcription = response.parsed.transcription.strip()
+            transcription = parsed.transcription.strip()
             return transcription
             
         except Exception as e:
-            print(f"Gemini Transcription Error: {e}")
-            return ""
\ No newline at end of file
+            logger.exception("Gemini Transcription Error: %s", e)
+            return ""
+        finally:
+            # Uploads are deleted without delaying the transcription
+            if uploaded_file is not None:
+                Thread(target=self._delete_file, args=(uploaded_file.name,)).start()
\ No newline at end of file
@@ -4,14 +4,22 @@ OpenAI Whisper API transcriber implementation.
 
 import os
 import io
-from openai import OpenAI
-from uttertype.transcribers.base import AudioTranscriber
+import logging
+from typing import Dict
+import httpx
+from openai import DefaultHttpxClient, OpenAI
+from uttertype.transcribers.base import AudioTranscriber, HTTP_POOL_LIMITS
+
+logger = logging.getLogger(__name__)
 
 
 class WhisperAPITranscriber(AudioTranscriber):
     """
     Transcriber implementation using OpenAI's Whisper API.
     """
+
+    # Clients are shared between instances, keyed by base URL, to reuse connections
+    _clients: Dict[str, OpenAI] = {}
     
     def __init__(self, base_url, model_name, *args, **kwargs):
         """
@@ -24,7 +32,18 @@ class WhisperAPITranscriber(AudioTranscriber):
         super().__init__(*args, **kwargs)
 
         self.model_name = model_name
-        self.client = OpenAI(base_url=base_url)
+        self.client = self._get_client(base_url)
+
+    @classmethod
+    def _get_client(cls, base_url: str) -> OpenAI:
+        """Get the shared OpenAI client for `base_url`, creating it on first use."""
+        if base_url not in cls._clients:
+            # Keeps the OpenAI defaults (timeouts, redirects) besides the transport
+            http_client = DefaultHttpxClient(
+                transport=httpx.HTTPTransport(retries=2, limits=HTTP_POOL_LIMITS),
+            )
+            cls._clients[base_url] = OpenAI(base_url=base_url, http_client=http_client)
+        return cls._clients[base_url]
 
     @staticmethod
     def create(*args, **kwargs):
@@ -59,5 +78,5 @@ class WhisperAPITranscriber(AudioTranscriber):
             )
             return transcription
         except Exception as e:
-            print(f"Encountered Error: {e}")
+            logger.exception("Encountered Error: %s", e)
             return ""
\ No newline at end of file
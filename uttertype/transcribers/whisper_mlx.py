@@ -3,9 +3,14 @@ Local Whisper MLX transcriber implementation.
 """
 
 import os
-import io
-import tempfile
-from uttertype.transcribers.base import AudioTranscriber
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from uttertype.transcribers.base import AudioTranscriber, RATE
+
+logger = logging.getLogger(__name__)
+
+# Length of the silent clip transcribed at startup to warm up the model
+WARMUP_DURATION_S = 0.1
 
 
 class WhisperLocalMLXTranscriber(AudioTranscriber):
@@ -13,7 +18,12 @@ class WhisperLocalMLXTranscriber(AudioTranscriber):
     Transcriber implementation using local Whisper MLX models.
     
     This transcriber uses Apple MLX framework for running Whisper models locally.
+    The model consumes audio samples directly, so it takes raw PCM instead of WAV.
+    All inference runs on one dedicated thread, which keeps the MLX state on the
+    thread that warmed it up.
     """
+
+    accepts_raw_pcm = True
     
     def __init__(self, model_type="distil-medium.en", *args, **kwargs):
         """
@@ -30,6 +40,16 @@ class WhisperLocalMLXTranscriber(AudioTranscriber):
             raise ImportError(
                 "lightning-whisper-mlx not found. Install with: uv sync --extra mlx"
             )
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        # Transcribe a short silence, so the first dictation does not pay for lazy
+        # weight loading and Metal kernel compilation
+        try:
+            silence = bytes(int(RATE * WARMUP_DURATION_S) * 2)
+            self._executor.submit(self._transcribe_pcm, silence).result()
+        except Exception as e:
+            logger.warning("MLX model warmup failed: %s", e)
     
     @staticmethod
     def create(*args, **kwargs):
@@ -42,22 +62,30 @@ class WhisperLocalMLXTranscriber(AudioTranscriber):
         model_type = os.getenv('MLX_MODEL_NAME', 'distil-medium.en')
         return WhisperLocalMLXTranscriber(model_type=model_type)
 
-    def transcribe_audio(self, audio: io.BytesIO) -> str:
+    def _transcribe_pcm(self, audio: bytes) -> str:
+        import numpy as np  # Installed along with lightning-whisper-mlx
+
+        # Whisper expects float32 samples in [-1, 1)
+        samples = np.frombuffer(audio, dtype=np.int16).astype(np.float32) / 32768.0
+        return self.model.transcribe(samples)["text"]
+
+    def transcribe_audio(self, audio: bytes) -> str:
         """
         Transcribe audio using local Whisper MLX model.
         
         Args:
-            audio: Audio data in BytesIO object
+            audio: Raw 16-bit mono PCM audio at 16 kHz
             
         Returns:
             Transcription as text
         """
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmpfile:
-                tmpfile.write(audio.getvalue())
-                transcription = self.model.transcribe(tmpfile.name)["text"]
-                os.unlink(tmpfile.name)
-            return transcription
+            return self._executor.submit(self._transcribe_pcm, audio).result()
         except Exception as e:
-            print(f"Encountered Error: {e}")
-            return ""
\ No newline at end of file
+            logger.exception("Encountered Error: %s", e)
+            return ""
+
+    def cleanup(self):
+        """Clean up resources when shutting down."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        super().cleanup()
\ No newline at end of file
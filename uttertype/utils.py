@@ -1,3 +1,5 @@
+import logging
+import os
 import sys
 import time
 import pyperclip
@@ -5,8 +7,21 @@ import pyautogui
 from typing import List
 from pynput import keyboard
 
+logger = logging.getLogger(__name__)
+
 keyboard_writer = keyboard.Controller()
 
+# Values of boolean environment variables that turn a setting on
+TRUTHY_ENV_VALUES = frozenset(('true', 'yes', '1', 't'))
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean setting from the environment variable `name`."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in TRUTHY_ENV_VALUES
+
 
 def clipboard_type(text):
     """
@@ -15,7 +30,7 @@ def clipboard_type(text):
     """
     original_clipboard_content = pyperclip.paste()
     pyperclip.copy(text)
-    print("Pasting:", text)
+    logger.debug("Pasting: %s", text)
     pyautogui.hotkey("command" if sys.platform == "darwin" else "ctrl", "v")
     pyperclip.copy(original_clipboard_content)
 